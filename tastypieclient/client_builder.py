@@ -9,7 +9,13 @@ from urlparse import urlparse
 import json
 import sys
 
-import requests
+from . import fields
+from . import resources
+from .fetch import session
+
+
+# What TastyPie puts in a schema for fields without a default
+NO_DEFAULT = "No default provided."
 
 
 class Client(object):
@@ -28,7 +34,7 @@ class ClientBuilder(object):
 
         These top-level entry points will correspond with generated Resources.
         """
-        data = json.loads(requests.get(self.client.base_url).content)
+        data = json.loads(session.get(self.client.base_url).content)
         return data
 
     def _write_import_block(self, outstream):
@@ -48,6 +54,15 @@ class ClientBuilder(object):
             cg.write("")
             cg.write("")
 
+    def _write_related_resource_classes(self, outstream, resources):
+        """Make related fields only resolve to this module's Resources."""
+        with CodeGeneratorBackend(outstream=outstream) as cg:
+            cg.write("related_resource_classes = (%s)" % "".join(
+                "%s, " % resource.class_name for resource in resources))
+            for resource in resources:
+                cg.write("%s.related_resource_classes = "
+                         "related_resource_classes" % resource.class_name)
+
     def generate_client(self, name):
         """Generate the client module for the base_url."""
         entry_points = self._get_entry_points()
@@ -59,6 +74,7 @@ class ClientBuilder(object):
             self._write_import_block(fp)
             for resource in resources:
                 self._write_resource(fp, resource)
+            self._write_related_resource_classes(fp, resources)
 
 
 class Resource(object):
@@ -74,10 +90,31 @@ class Resource(object):
         self.name = name
         self.list_endpoint = list_endpoint
         if isinstance(schema, Schema):
-            self.schema = Schema
+            self.schema = schema
         else:
             self.schema = Schema(self.client, schema)
 
+    @property
+    def class_name(self):
+        return str(self.name.title().replace("_", ""))
+
+    def build_class(self, module=__name__):
+        """Build the Resource subclass that the generated source declares.
+
+        Args:
+            module: The `__module__` to give the new class.
+        """
+        attrs = {
+            '__module__': module,
+            'list_endpoint': self.list_endpoint,
+            'default_format': self.schema.default_format,
+            'default_limit': self.schema.default_limit,
+        }
+        for field_name, field in self.schema.field_list:
+            attrs[str(field_name)] = field.build_field()
+        return resources.ResourceMetaClass(
+            self.class_name, (resources.Resource,), attrs)
+
     def _write_class_constants(self, code_generator_backend):
         cg = code_generator_backend
         cg.write("list_endpoint = '%s'" % self.list_endpoint)
@@ -92,8 +129,7 @@ class Resource(object):
 
     def _write_generated_source(self, outstream):
         with CodeGeneratorBackend(outstream=outstream) as cg:
-            cg.write("class %s(Resource):" %
-                     self.name.title().replace("_", ""))
+            cg.write("class %s(Resource):" % self.class_name)
             cg.indent()
 
             self._write_class_constants(cg)
@@ -108,12 +144,20 @@ class Resource(object):
 
 
 class Schema(object):
-    def __init__(self, client, schema_url):
-        """Initialize a Schema object from a TastyPie schema declaration."""
+    def __init__(self, client, schema_url, data=None):
+        """Initialize a Schema object from a TastyPie schema declaration.
+
+        Args:
+            schema_url: The URL of the schema declaration.
+            data: The already fetched schema declaration, if any. If not
+                given, it is fetched from `schema_url`.
+        """
         self.client = client
 
-        data = json.loads(requests.get(
-            urljoin(self.client.base_host, schema_url)).content)
+        if data is None:
+            data = json.loads(session.get(
+                urljoin(self.client.base_host, schema_url)).content)
+        self.data = data
         self.detail_methods = data['allowed_detail_http_methods']
         self.list_methods = data['allowed_list_http_methods']
         self.default_format = data['default_format']
@@ -143,9 +187,13 @@ class Field(object):
         self.readonly = readonly
         self.unique = unique
 
-    def write_field(self, code_generator_backend):
-        cg = code_generator_backend
+    @property
+    def has_default(self):
+        return self.default is not None and self.default != NO_DEFAULT
 
+    @property
+    def field_class_name(self):
+        """The name of the tastypieclient.fields class for this Field."""
         field_types = {
             'boolean': 'BooleanField',
             'string': 'CharField',
@@ -159,6 +207,22 @@ class Field(object):
             field_cls = field_types[self.related_type]
         else:
             field_cls = field_types[self.type]
+        return field_cls
+
+    def build_field(self):
+        """Build the Field that the generated source would declare."""
+        field_cls = getattr(fields, self.field_class_name)
+        return field_cls(
+            help_text=self.help_text,
+            blank=self.blank,
+            nullable=self.nullable,
+            readonly=self.readonly,
+            unique=self.unique,
+            has_default=self.has_default)
+
+    def write_field(self, code_generator_backend):
+        cg = code_generator_backend
+        field_cls = self.field_class_name
 
         cg.write("{name} = {field}(".format(
             name=self.name,
@@ -169,7 +233,8 @@ class Field(object):
         cg.write("blank=%s," % self.blank)
         cg.write("nullable=%s," % self.nullable)
         cg.write("readonly=%s," % self.readonly)
-        cg.write("unique=%s)" % self.unique)
+        cg.write("unique=%s," % self.unique)
+        cg.write("has_default=%s)" % self.has_default)
         cg.dedent()
 
 
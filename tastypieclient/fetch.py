@@ -0,0 +1,90 @@
+"""Shared network access for deferred resolution.
+
+Every GET for a related resource goes through `get_json`, which coalesces
+concurrent requests for the same URI: the first caller makes the request and
+every other caller that arrives while it is in flight waits for, and shares,
+its result.
+
+All requests share `session`, so connections are pooled, and transport
+adapters mounted on it apply to every client request.
+"""
+import json
+import threading
+
+import requests
+
+
+class _Call(object):
+    """A single in-flight request, and the result its waiters will share."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    def __init__(self):
+        """Deduplicate concurrent calls that share a key.
+
+        Only in-flight calls are shared; once a call finishes, the next call
+        for the same key starts a new one. Caching results is left to the
+        callers.
+        """
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call `fn`, unless a call for `key` is already in flight.
+
+        Args:
+            key: Identifies calls that can share a result.
+            fn: The function to call.
+            args, kwargs: Passed to `fn`.
+        Returns the result of `fn`, as computed by whichever caller got
+        there first. If that call raised, every waiter raises too.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            # Don't hand KeyboardInterrupt and friends to other threads, but
+            # don't let them think the call succeeded with None either.
+            call.error = RuntimeError(
+                "The in-flight call for %r was interrupted" % (key,))
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+session = requests.Session()
+
+_single_flight = SingleFlight()
+
+
+def _get_json(uri):
+    return json.loads(session.get(uri).content)
+
+
+def get_json(uri):
+    """GET `uri` and decode the JSON body, sharing any identical GET in flight.
+
+    The decoded data is shared between waiters, so treat it as read-only.
+    """
+    return _single_flight.do(uri, _get_json, uri)
@@ -1,14 +1,22 @@
-import json
+from collections import OrderedDict
+from urllib import urlencode
 from urlparse import urljoin
 from urlparse import urlparse
+import threading
 import uuid
 
 from dateutil import parser as date_parser
-import requests
 
+from .fetch import SingleFlight
+from .fetch import get_json
 from .resources import Resource
 
 
+# Resolutions of a single DeferredField on a single instance that are in
+# flight, keyed by (id(instance), cache_name).
+_resolving = SingleFlight()
+
+
 class Field(object):
     def __init__(self,
                  blank=False,
@@ -16,18 +24,20 @@ class Field(object):
                  readonly=False,
                  unique=False,
                  required=False,
-                 help_text=""):
+                 help_text="",
+                 has_default=False):
         """Fields are individual data elements of a Resource.
 
         The init kwargs here will mean the same things as they do in TastyPie.
 
         Args:
-            blank: Whether or not the field can be blank
+            blank: Whether or not the field can be left out of the data
             nullable: Whether or not the field can be null
             readonly: If the Field is read-only
             unique: If the Field is unique among all Resources
             required: If the Field is required for object creation
             help_text: Any help text given
+            has_default: If the server fills the Field in when it's left out
 
         Fields use __get__ and some metaclass magic to work like typical Django
         style fields.
@@ -42,6 +52,7 @@ class Field(object):
         self.unique = unique
         self.required = required
         self.help_text = help_text
+        self.has_default = has_default
 
     def contribute_to_class(self, cls, name):
         """Add the appropriately named attribute to the class.
@@ -245,6 +256,10 @@ class DeferredList(list):
             return self.deferred_fields[index].__get__(
                 self.instance, self.owner)
 
+    def __getslice__(self, start, stop):
+        # list implements __getslice__, which would bypass __getitem__
+        return self.__getitem__(slice(start, stop))
+
     def __repr__(self):
         return "DeferredList(%s)" % ",".join(
             resource.__repr__() for resource in self.deferred_fields)
@@ -253,10 +268,113 @@ class DeferredList(list):
         return self.__repr__()
 
 
+class PagedList(object):
+    """A to-many relation loaded a page at a time from a list endpoint.
+
+    Rather than holding one DeferredField per related URI, PagedLists query
+    the related Resource's list_endpoint, filtered by the parent, and only
+    for the pages that are actually indexed. `len()` comes from the
+    `total_count` TastyPie returns with every page, and only the most
+    recently used pages are kept around.
+
+    The parent's own payload still carries the full list of related URIs;
+    it just isn't turned into DeferredFields. Pages are only stable if the
+    related Resource returns rows in a fixed order, so give the field an
+    `order_by` unless the related model has a default ordering.
+    """
+    max_cached_pages = 4
+
+    def __init__(self, field, instance):
+        self.field = field
+        self.instance = instance
+        self._total_count = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def parent_id(self):
+        """The primary key of the parent, taken from its resource_uri."""
+        resource_uri = getattr(self.instance, 'resource_uri', None)
+        if not resource_uri:
+            raise ValueError("'%s' on '%s' needs a resource_uri to page" %
+                             (self.field.name, self.field.owner.__name__))
+        return urlparse(resource_uri).path.rstrip('/').rsplit('/', 1)[-1]
+
+    def get_page(self, page):
+        """Return the list of Resources on the given page."""
+        with self._lock:
+            if page in self._pages:
+                self._pages[page] = self._pages.pop(page)
+                return self._pages[page]
+
+        related_resource_class = self.field.related_resource_class
+        params = [(self.field.filter_field, self.parent_id)]
+        if self.field.order_by:
+            params.append(('order_by', self.field.order_by))
+        params.append(('limit', self.field.page_size))
+        params.append(('offset', page * self.field.page_size))
+        query = urlencode(params)
+        data = get_json("%s?%s" % (
+            urljoin(self.instance.base_url,
+                    related_resource_class.list_endpoint),
+            query))
+        objects = [related_resource_class(
+                       base_url=self.instance.base_url, **obj)
+                   for obj in data['objects']]
+
+        with self._lock:
+            self._total_count = data['meta']['total_count']
+            self._pages[page] = objects
+            while len(self._pages) > self.max_cached_pages:
+                self._pages.popitem(last=False)
+        return objects
+
+    def __len__(self):
+        if self._total_count is None:
+            self.get_page(0)
+        return self._total_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            if (start >= 0 and index.stop is not None and index.stop >= 0 and
+                    (index.step or 1) > 0):
+                # Fetching the first page sliced also sets the total count,
+                # so the earlier pages are never needed.
+                self.get_page(start // self.field.page_size)
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError("PagedList index out of range")
+        page, offset = divmod(index, self.field.page_size)
+        objects = self.get_page(page)
+        # Also covers the relation shrinking since len() was last fetched
+        if offset >= len(objects):
+            raise IndexError("PagedList index out of range")
+        return objects[offset]
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        try:
+            parent_id = self.parent_id
+        except ValueError:
+            parent_id = None
+        return "PagedList(%s, %s=%s)" % (
+            self.field.related_resource_class.list_endpoint,
+            self.field.filter_field, parent_id)
+
+    def __str__(self):
+        return self.__repr__()
+
+
 class ToManyField(Field):
     """A deferred relation from one to many objects.
 
-    This is just a list of DeferredFields.
+    This is just a list of DeferredFields, or a PagedList if `paged`.
     """
     def __init__(self, related_resource_class=None, *args, **kwargs):
         """Initialize the ToManyField.
@@ -264,12 +382,42 @@ class ToManyField(Field):
         Args:
             related_resource_class: The `Resource` subclass you want to
                 instanstiate with this deferred data, passed to DeferredField.
+            paged: If True, ignore the embedded list of URIs and load the
+                relation lazily, a page at a time, from the
+                related_resource_class's list_endpoint.
+            filter_field: For paged relations, the filter on the related
+                Resource that selects the parent, e.g. 'blag' for Blag.posts.
+            page_size: For paged relations, how many objects to get at once.
+            order_by: For paged relations, the field of the related Resource
+                to order pages by, e.g. 'id'. It must be in the related
+                Resource's `ordering`.
+
+        Neither ClientBuilder nor the runtime client can tell which Resource
+        a relation points to, so paged relations are only available on
+        hand-declared Resources. The paging options can only be given by
+        keyword, so positional arguments still line up with Field's.
         """
+        paged = kwargs.pop('paged', False)
+        filter_field = kwargs.pop('filter_field', None)
+        page_size = kwargs.pop('page_size', 20)
+        order_by = kwargs.pop('order_by', None)
         super(ToManyField, self).__init__(*args, **kwargs)
+        if paged and not (related_resource_class and filter_field):
+            raise ValueError("Paged ToManyFields need a "
+                             "related_resource_class and a filter_field")
         self.related_resource_class = related_resource_class
+        self.paged = paged
+        self.filter_field = filter_field
+        self.page_size = page_size
+        self.order_by = order_by
         self.base_url = None
 
     def __set__(self, instance, value):
+        if self.paged:
+            super(ToManyField, self).__set__(
+                instance, PagedList(self, instance))
+            return
+
         if not value:
             super(ToManyField, self).__set__(instance, value)
             return
@@ -301,15 +449,16 @@ class DeferredField(Field):
         Resource's list_endpoint.
         """
         super(DeferredField, self).__init__(*args, **kwargs)
-        self.instance = None  # TODO: Is `instance` here a bug?
         self.related_resource_class = related_resource_class
 
     @classmethod
-    def get_related_resource_class(cls, uri):
+    def get_related_resource_class(cls, uri, candidates=None):
         """Try to figure out the related resource class.
 
         Args:
             uri: The full URI of the related resource.
+            candidates: The Resource classes to choose from. If not given,
+                every Resource subclass is considered.
 
         uri is going to look something like
         http://example.com/blog/api/v1/entry/<entry_id>?filter_param=1
@@ -317,6 +466,12 @@ class DeferredField(Field):
         so we can use this knowledge to try to guess the correct resource.
         """
         parsed_uri = urlparse(uri)
+        if candidates is not None:
+            for candidate in candidates:
+                if parsed_uri.path.startswith(candidate.list_endpoint):
+                    return candidate
+            return None
+
         subclasses = Resource.__subclasses__()
         for subclass in subclasses:
             if parsed_uri.path.startswith(subclass.list_endpoint):
@@ -324,26 +479,76 @@ class DeferredField(Field):
             subclasses.extend(subclass.__subclasses__())
         return None
 
-    def __get__(self, instance, owner):
-        if self.instance:
-            return self.instance
+    @property
+    def cache_name(self):
+        """The key under which the fetched Resource is kept on an instance.
 
-        value = super(DeferredField, self).__get__(instance, owner)
+        The descriptor is shared by every instance of the owning Resource, so
+        the fetched object has to live on the instance rather than on self.
+        """
+        return "_cached_%s" % self.name
+
+    def get_uri(self, instance):
+        """Return the absolute URI this field points to on `instance`."""
+        value = instance.__dict__.get(self.name)
         if not value:
             return value
-
-        # First make sure that the deferred URL is gettable
         if not urlparse(value).netloc:
             # Default to using the currently known base url
             value = urljoin(instance.base_url, value)
-        # We haven't gotten this object yet, so fetch it and try to instantiate
-        data = json.loads(requests.get(value).content)
+        return value
+
+    def get_cached(self, instance):
+        """Return the already fetched Resource, or None."""
+        return instance.__dict__.get(self.cache_name)
+
+    def set_cached(self, instance, resource):
+        """Wire an already fetched Resource into this field on `instance`."""
+        instance.__dict__[self.cache_name] = resource
+
+    def resolve_related_resource_class(self, instance, uri):
+        """Return the Resource subclass to instantiate for `uri`.
+
+        If the owning Resource lists the classes it was built with in
+        `related_resource_classes`, only those are considered, so that
+        clients for different services or schema versions don't pick up
+        each other's classes.
+        """
         if not self.related_resource_class:
             self.related_resource_class = self.get_related_resource_class(
-                value)
-        self.instance = self.related_resource_class(
-            base_url=instance.base_url, **data)
-        return self.instance
+                uri, instance.related_resource_classes)
+        return self.related_resource_class
+
+    def build_resource(self, instance, uri, data):
+        """Instantiate the related Resource from fetched `data`."""
+        related_resource_class = self.resolve_related_resource_class(
+            instance, uri)
+        return related_resource_class(base_url=instance.base_url, **data)
+
+    def __get__(self, instance, owner):
+        cached = self.get_cached(instance)
+        if cached is not None:
+            return cached
+
+        value = super(DeferredField, self).__get__(instance, owner)
+        if not value:
+            return value
+
+        # Threads racing on this field share one resolution, and threads
+        # racing on the same URI from different fields share one request.
+        return _resolving.do(
+            (id(instance), self.cache_name), self._resolve, instance)
+
+    def _resolve(self, instance):
+        """Fetch, instantiate and cache the related Resource."""
+        # Another thread may have finished resolving this before we got here
+        cached = self.get_cached(instance)
+        if cached is not None:
+            return cached
+        uri = self.get_uri(instance)
+        resource = self.build_resource(instance, uri, get_json(uri))
+        self.set_cached(instance, resource)
+        return resource
 
     def __set__(self, instance, value):
         """DeferredFields expect `value` to be a URL."""
@@ -358,4 +563,4 @@ class DeferredField(Field):
 
         If you request the attribute again, it will make the network request
         again."""
-        self.instance = None
+        instance.__dict__.pop(self.cache_name, None)
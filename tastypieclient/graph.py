@@ -0,0 +1,175 @@
+"""Breadth-first expansion of related Resources.
+
+Touching `DeferredField` and `ToManyField` attributes one at a time walks the
+object graph depth-first, with a blocking GET for every edge. `expand` walks
+it a level at a time instead: every unresolved URI on a level is collected,
+deduplicated, fetched concurrently through TastyPie's `set/` endpoint, and
+wired back into the fields that point at it.
+"""
+from multiprocessing.pool import ThreadPool
+from urlparse import urljoin
+from urlparse import urlparse
+
+from .fetch import get_json
+from .fields import DeferredField
+from .fields import DeferredList
+from .fields import ToManyField
+
+
+def expand(objects, depth=1, follow=None, batch_size=20, concurrency=4):
+    """Materialize the related Resources of `objects`.
+
+    Args:
+        objects: An iterable of Resources to expand from.
+        depth: How many levels of relations to follow.
+        follow: An iterable of Django-style relation paths, such as
+            ('posts', 'posts__blag'). If not given, every related field is
+            followed, down to `depth`.
+        batch_size: The most objects to request in a single `set/` call.
+        concurrency: How many requests to have in flight at once.
+    Returns the list of objects, with their relations resolved in place.
+
+    Each level costs about `len(uris) / batch_size` requests, issued
+    `concurrency` at a time. Resources reachable along several paths are
+    only fetched once and are shared between every field pointing at them.
+    """
+    objects = list(objects)
+    if follow is not None:
+        follow = tuple(follow)
+    resolved = {}  # uri -> Resource, shared across levels
+    for obj in objects:
+        uri = _absolute_uri(obj)
+        if uri:
+            resolved.setdefault(uri, obj)
+    level = [(obj, "") for obj in objects]
+    pool = ThreadPool(concurrency)
+    try:
+        for _ in range(depth):
+            pending = {}  # uri -> [(field, instance, path), ...]
+            next_level = []
+            for instance, prefix in level:
+                for path, field in _related_fields(instance, prefix, follow):
+                    for deferred in _deferred_fields(instance, field):
+                        uri = deferred.get_uri(instance)
+                        if not uri:
+                            continue
+                        cached = deferred.get_cached(instance)
+                        if cached is None and uri in resolved:
+                            cached = resolved[uri]
+                            deferred.set_cached(instance, cached)
+                        elif cached is not None:
+                            resolved.setdefault(uri, cached)
+                        if cached is not None:
+                            next_level.append((cached, path + "__"))
+                        else:
+                            pending.setdefault(uri, []).append(
+                                (deferred, instance, path))
+            related_classes = {}
+            for uri, waiters in pending.iteritems():
+                deferred, instance, _ = waiters[0]
+                related_classes[uri] = (
+                    deferred.resolve_related_resource_class(instance, uri))
+            fetched = _fetch_all(pool, related_classes, batch_size)
+            for uri, waiters in pending.iteritems():
+                data = fetched.get(urlparse(uri).path)
+                if data is None:
+                    continue
+                deferred, instance, _ = waiters[0]
+                resource = deferred.build_resource(instance, uri, data)
+                resolved[uri] = resource
+                for deferred, instance, path in waiters:
+                    deferred.set_cached(instance, resource)
+                    next_level.append((resource, path + "__"))
+            level = _dedupe(next_level)
+            if not level:
+                break
+    finally:
+        pool.close()
+        pool.join()
+    return objects
+
+
+def _absolute_uri(instance):
+    """Return the absolute resource_uri of `instance`, or None."""
+    uri = instance.__dict__.get('resource_uri')
+    if uri and not urlparse(uri).netloc:
+        uri = urljoin(instance.base_url, uri)
+    return uri
+
+
+def _related_fields(instance, prefix, follow):
+    """Yield (path, field) for each relation on `instance` to follow."""
+    for name, field in sorted(type(instance)._fields.iteritems()):
+        if not isinstance(field, (DeferredField, ToManyField)):
+            continue
+        path = prefix + name
+        if follow is None or any(
+                f == path or f.startswith(path + "__") for f in follow):
+            yield path, field
+
+
+def _deferred_fields(instance, field):
+    """Return the DeferredFields that back `field` on `instance`."""
+    if isinstance(field, ToManyField):
+        value = instance.__dict__.get(field.name)
+        if isinstance(value, DeferredList):
+            return value.deferred_fields
+        return []
+    return [field]
+
+
+def _dedupe(level):
+    """Drop repeated (Resource, path) pairs, keeping their order."""
+    seen = set()
+    unique = []
+    for instance, prefix in level:
+        key = (id(instance), prefix)
+        if key not in seen:
+            seen.add(key)
+            unique.append((instance, prefix))
+    return unique
+
+
+def _fetch_all(pool, related_classes, batch_size):
+    """Fetch every uri in `related_classes`, returning a dict of path -> data.
+
+    Args:
+        related_classes: A dict of uri -> the Resource class it points to.
+    """
+    requests_to_make = []
+    grouped = {}  # (host, list_endpoint) -> [detail_id, ...]
+    for uri, related_cls in related_classes.iteritems():
+        parsed_uri = urlparse(uri)
+        detail_id = None
+        if related_cls is not None:
+            detail_id = parsed_uri.path[
+                len(related_cls.list_endpoint):].strip("/")
+        if not detail_id or "/" in detail_id:
+            # Not something `set/` can address, so fetch it by itself.
+            requests_to_make.append((uri, False))
+            continue
+        host = parsed_uri.scheme + "://" + parsed_uri.netloc
+        grouped.setdefault(
+            (host, related_cls.list_endpoint), []).append(detail_id)
+
+    for (host, list_endpoint), detail_ids in grouped.iteritems():
+        set_endpoint = urljoin(host, list_endpoint.rstrip("/") + "/set/")
+        for start in range(0, len(detail_ids), batch_size):
+            batch = detail_ids[start:start + batch_size]
+            requests_to_make.append(
+                (set_endpoint + ";".join(batch) + "/", True))
+
+    fetched = {}
+    for objects in pool.map(_fetch, requests_to_make):
+        fetched.update(objects)
+    return fetched
+
+
+def _fetch(request):
+    """Perform a single GET, returning a dict of path -> data."""
+    uri, is_set = request
+    data = get_json(uri)
+    if not is_set:
+        return {urlparse(uri).path: data}
+    return dict((urlparse(obj['resource_uri']).path, obj)
+                for obj in data.get('objects', []))
@@ -0,0 +1,519 @@
+#!/usr/bin/env python
+"""Closed-loop load generation using a generated client module.
+
+Replays a weighted scenario of client actions with a number of concurrent
+virtual users. Each virtual user starts its next action as soon as its last
+one finishes, and the throughput and latency percentiles of every action are
+reported at the end.
+
+Scenarios are JSON lists of actions:
+
+    [
+        {"weight": 5, "action": "list", "resource": "Post", "limit": 20},
+        {"weight": 10, "action": "detail", "resource": "Post"},
+        {"weight": 3, "action": "traverse", "resource": "Post",
+         "field": "blag"},
+        {"weight": 1, "action": "bulk_write", "resource": "Post",
+         "objects": [{"title": "Hi", "body": "...",
+                      "blag": "/api/v1/blag/1/"}]}
+    ]
+
+With `--offline`, requests are served in-process by the Django service in
+tests/django_test_service, and the time spent inside the server is measured
+separately so that client-side overhead can be told apart from server time.
+"""
+from StringIO import StringIO
+from datetime import timedelta
+from urllib import unquote
+from urllib import urlencode
+from urlparse import urljoin
+from urlparse import urlparse
+import argparse
+import atexit
+import imp
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from . import fetch
+from .fields import DeferredField
+from .fields import DeferredList
+from .resources import Resource
+
+
+OFFLINE_BASE_URL = "http://testserver/"
+TEST_SERVICE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests", "django_test_service")
+
+
+class ServerTimer(object):
+    def __init__(self):
+        """Accumulate the time each thread spends waiting on the server."""
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.total = 0.0
+
+    def add(self, seconds):
+        self._local.total = self.total + seconds
+
+    @property
+    def total(self):
+        return getattr(self._local, 'total', 0.0)
+
+
+class WSGIAdapter(BaseAdapter):
+    def __init__(self, application, timer=None):
+        """A transport adapter that serves requests from a WSGI application.
+
+        Args:
+            application: The WSGI callable to send requests to.
+            timer: An optional ServerTimer, credited with the time spent
+                inside `application` for every request.
+        """
+        super(WSGIAdapter, self).__init__()
+        self.application = application
+        self.timer = timer
+
+    def send(self, request, **kwargs):
+        parsed_url = urlparse(request.url)
+        body = request.body or ''
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(parsed_url.path),
+            'QUERY_STRING': parsed_url.query,
+            'SERVER_NAME': parsed_url.hostname,
+            'SERVER_PORT': str(parsed_url.port or 80),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': parsed_url.scheme,
+            'wsgi.input': StringIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                environ[key] = value
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        start = time.time()
+        result = self.application(environ, start_response)
+        try:
+            content = ''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        elapsed = time.time() - start
+        if self.timer is not None:
+            self.timer.add(elapsed)
+
+        status, headers = started
+        response = Response()
+        response.status_code = int(status.split(' ', 1)[0])
+        response.reason = status.split(' ', 1)[-1]
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = StringIO(content)
+        response._content = content
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=elapsed)
+        return response
+
+    def close(self):
+        pass
+
+
+class Action(object):
+    """A single weighted step of a scenario, run against one Resource."""
+    def __init__(self, resource_class, base_url, weight=1, **options):
+        self.resource_class = resource_class
+        self.base_url = base_url
+        self.weight = weight
+        self.options = options
+
+    @property
+    def label(self):
+        return "%s %s" % (self.name, self.resource_class.list_endpoint)
+
+    @property
+    def list_url(self):
+        return urljoin(self.base_url, self.resource_class.list_endpoint)
+
+    def prepare(self, corpus):
+        """Gather whatever the action needs before the clock starts."""
+        self.corpus = corpus
+
+    def run(self, rng):
+        raise NotImplementedError()
+
+    def _get_json(self, url):
+        # Deliberately not fetch.get_json: identical requests from different
+        # virtual users should not be coalesced into one.
+        response = fetch.session.get(url)
+        response.raise_for_status()
+        return json.loads(response.content)
+
+
+class ListAction(Action):
+    """Fetch a page of the list endpoint and hydrate every object on it."""
+    name = "list"
+
+    def run(self, rng):
+        query = urlencode({'limit': self.options.get('limit', 20)})
+        data = self._get_json(self.list_url + "?" + query)
+        return [self.resource_class(base_url=self.base_url, **obj)
+                for obj in data['objects']]
+
+
+class DetailAction(Action):
+    """Fetch a single object by its URI."""
+    name = "detail"
+
+    def run(self, rng):
+        uri = rng.choice(self.corpus[self.resource_class])['resource_uri']
+        data = self._get_json(urljoin(self.base_url, uri))
+        return self.resource_class(base_url=self.base_url, **data)
+
+
+class TraverseAction(Action):
+    """Follow a deferred relation from a freshly hydrated object."""
+    name = "traverse"
+
+    def __init__(self, resource_class, base_url, weight=1, **options):
+        super(TraverseAction, self).__init__(
+            resource_class, base_url, weight=weight, **options)
+        field = options.get('field')
+        if field not in resource_class._fields:
+            raise ValueError("'%s' is not a field on '%s'" %
+                             (field, resource_class.__name__))
+
+    @property
+    def label(self):
+        return "%s %s %s" % (
+            self.name, self.resource_class.list_endpoint,
+            self.options['field'])
+
+    def run(self, rng):
+        data = rng.choice(self.corpus[self.resource_class])
+        instance = self.resource_class(base_url=self.base_url, **data)
+        field = self.resource_class._fields[self.options['field']]
+        if isinstance(field, DeferredField):
+            return self._resolve(field, instance)
+        related = instance.__dict__.get(field.name)
+        if not isinstance(related, DeferredList):
+            return related
+        return [self._resolve(deferred, instance) for deferred in
+                related.deferred_fields[:self.options.get('limit', 5)]]
+
+    def _resolve(self, deferred, instance):
+        """Resolve a DeferredField like `__get__` does, but uncoalesced.
+
+        `DeferredField.__get__` shares in-flight requests between threads,
+        which would hide load from the server and credit the shared
+        request's server time to only one virtual user.
+        """
+        uri = deferred.get_uri(instance)
+        if not uri:
+            return None
+        resource = deferred.build_resource(
+            instance, uri, self._get_json(uri))
+        deferred.set_cached(instance, resource)
+        return resource
+
+
+class BulkWriteAction(Action):
+    """PATCH a batch of objects to the list endpoint in one request."""
+    name = "bulk_write"
+
+    def run(self, rng):
+        response = fetch.session.patch(
+            self.list_url,
+            data=json.dumps({'objects': self.options['objects']}),
+            headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return response
+
+
+ACTIONS = {
+    'list': ListAction,
+    'detail': DetailAction,
+    'traverse': TraverseAction,
+    'bulk_write': BulkWriteAction,
+}
+
+
+class Scenario(object):
+    def __init__(self, actions):
+        """A weighted mix of Actions.
+
+        Args:
+            actions: A list of Actions, picked in proportion to their weight.
+        """
+        if not actions:
+            raise ValueError("A scenario needs at least one action")
+        self.actions = actions
+        self.total_weight = float(sum(action.weight for action in actions))
+
+    @classmethod
+    def from_json(cls, data, resources, base_url):
+        """Build a Scenario from its decoded JSON description.
+
+        Args:
+            data: A list of dicts, each with `action`, `resource` and an
+                optional `weight`, plus any options for that action.
+            resources: A dict of class name to Resource subclass.
+            base_url: The base url of the service.
+        """
+        actions = []
+        for step in data:
+            step = dict(step)
+            action_name = step.pop('action')
+            resource_name = step.pop('resource')
+            if action_name not in ACTIONS:
+                raise ValueError("Unknown action '%s'" % action_name)
+            if resource_name not in resources:
+                raise ValueError("Unknown resource '%s'" % resource_name)
+            actions.append(ACTIONS[action_name](
+                resources[resource_name], base_url, **step))
+        return cls(actions)
+
+    def choose(self, rng):
+        point = rng.random() * self.total_weight
+        for action in self.actions:
+            point -= action.weight
+            if point < 0:
+                return action
+        return self.actions[-1]
+
+    def prepare(self, sample_size=100):
+        """Sample existing objects for the actions that need them."""
+        corpus = {}
+        for action in self.actions:
+            resource_class = action.resource_class
+            if resource_class not in corpus:
+                query = urlencode({'limit': sample_size})
+                data = action._get_json(action.list_url + "?" + query)
+                corpus[resource_class] = data['objects']
+        for action in self.actions:
+            if (isinstance(action, (DetailAction, TraverseAction)) and
+                    not corpus[action.resource_class]):
+                raise ValueError("No '%s' objects to %s" % (
+                    action.resource_class.__name__, action.name))
+            action.prepare(corpus)
+
+
+class Recorder(object):
+    def __init__(self):
+        """Collect (latency, server time, error) samples per action label.
+
+        The first exception of each type is kept for every label, in
+        `errors`, and `elapsed` is the total time spent running.
+        """
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}  # label -> {exception type: first exception}
+        self.elapsed = 0.0
+
+    def record(self, label, latency, server_time, error=None):
+        """Record a sample, with the exception it failed with, if any."""
+        with self._lock:
+            self.samples.setdefault(label, []).append(
+                (latency, server_time, error is not None))
+            if error is not None:
+                self.errors.setdefault(label, {}).setdefault(
+                    type(error), error)
+
+    def report(self, duration=None, outstream=sys.stdout):
+        """Write throughput and latency percentiles for every action.
+
+        Latencies only cover successful samples. Throughput is over
+        `duration` seconds, or the measured `elapsed` time if not given.
+        """
+        if duration is None:
+            duration = self.elapsed
+        header = ("%-36s %7s %8s %8s %8s %8s %10s %10s %6s" % (
+            "endpoint", "count", "req/s", "p50 ms", "p95 ms", "p99 ms",
+            "server ms", "client ms", "errors"))
+        outstream.write(header + "\n")
+        outstream.write("-" * len(header) + "\n")
+        for label, samples in sorted(self.samples.items()):
+            succeeded = [sample for sample in samples if not sample[2]]
+            latencies = sorted(sample[0] for sample in succeeded)
+            server_times = sorted(sample[1] for sample in succeeded)
+            overheads = sorted(sample[0] - sample[1] for sample in succeeded)
+            errors = len(samples) - len(succeeded)
+            outstream.write(
+                "%-36s %7d %8.1f %8.1f %8.1f %8.1f %10.1f %10.1f %6d\n" % (
+                    label, len(samples), len(samples) / float(duration),
+                    percentile(latencies, 50) * 1000,
+                    percentile(latencies, 95) * 1000,
+                    percentile(latencies, 99) * 1000,
+                    percentile(server_times, 50) * 1000,
+                    percentile(overheads, 50) * 1000,
+                    errors))
+        for label, errors in sorted(self.errors.items()):
+            for error in errors.values():
+                outstream.write("%s: %s: %s\n" % (
+                    label, type(error).__name__, error))
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(percent * len(sorted_values) / 100.0)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def get_resources(client_module):
+    """Return a dict of class name to Resource subclass in the module."""
+    return dict((name, value) for name, value in vars(client_module).items()
+                if isinstance(value, type) and issubclass(value, Resource) and
+                value is not Resource)
+
+
+def load_client(path):
+    """Import a generated client module from its file path.
+
+    Generated clients are written as `<name>.py.<timestamp>`, which the
+    normal import machinery won't pick up.
+    """
+    name = os.path.basename(path).split('.')[0]
+    return imp.load_source(name, path)
+
+
+def setup_offline(timer, seed=10):
+    """Serve requests in-process from tests/django_test_service.
+
+    Args:
+        timer: The ServerTimer to credit with time spent in Django.
+        seed: Create this many Blags, each with `seed` Posts.
+    Returns the base url to point the client at.
+
+    Every run gets a fresh, temporary database, so runs are comparable and
+    nothing is written into the source tree.
+    """
+    if TEST_SERVICE_DIR not in sys.path:
+        sys.path.insert(0, TEST_SERVICE_DIR)
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "django_test_service.settings")
+
+    from django.conf import settings
+    fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(fd)
+    atexit.register(os.remove, db_path)
+    # Django only opens its connections on first use, so this still applies
+    settings.DATABASES['default']['NAME'] = db_path
+
+    from django.core.management import call_command
+    from django_test_service.wsgi import application
+    from myservice.models import Blag
+    from myservice.models import Post
+
+    call_command('syncdb', interactive=False, verbosity=0)
+    for blag_count in range(seed):
+        blag = Blag.objects.create(name="Blag %s" % blag_count)
+        Post.objects.bulk_create(
+            Post(blag=blag, title="Post %s" % post_count, body="Body")
+            for post_count in range(seed))
+
+    fetch.session.mount(OFFLINE_BASE_URL, WSGIAdapter(application, timer))
+    return OFFLINE_BASE_URL
+
+
+def run(scenario, users, duration, timer, recorder=None, think_time=0):
+    """Drive `scenario` with concurrent virtual users.
+
+    Args:
+        scenario: The Scenario to run.
+        users: The number of concurrent virtual users.
+        duration: How long to run for, in seconds.
+        timer: The ServerTimer that the transport credits server time to.
+        recorder: Where to collect samples. A new Recorder if not given.
+        think_time: Seconds each user waits between actions.
+    Returns the Recorder.
+    """
+    recorder = recorder or Recorder()
+    started = time.time()
+    deadline = started + duration
+
+    def virtual_user(seed):
+        rng = random.Random(seed)
+        while time.time() < deadline:
+            action = scenario.choose(rng)
+            timer.reset()
+            start = time.time()
+            error = None
+            try:
+                action.run(rng)
+            except Exception as e:
+                error = e
+            recorder.record(action.label, time.time() - start, timer.total,
+                            error)
+            if think_time:
+                time.sleep(think_time)
+
+    threads = [threading.Thread(target=virtual_user, args=(seed,))
+               for seed in range(users)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.elapsed += time.time() - started
+    return recorder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("client", help="Path to the generated client module.")
+    parser.add_argument("scenario", help="Path to the JSON scenario.")
+    parser.add_argument("--base-url", help="The base URL of the server.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve requests in-process from the Django "
+                             "test service instead of the network.")
+    parser.add_argument("--users", type=int, default=10,
+                        help="The number of concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="How long to run for, in seconds.")
+    parser.add_argument("--think-time", type=float, default=0,
+                        help="Seconds each user waits between actions.")
+    args = parser.parse_args()
+    if not args.offline and not args.base_url:
+        parser.error("one of --base-url or --offline is required")
+
+    timer = ServerTimer()
+    base_url = setup_offline(timer) if args.offline else args.base_url
+    client_module = load_client(args.client)
+    with open(args.scenario) as fp:
+        scenario = Scenario.from_json(
+            json.load(fp), get_resources(client_module), base_url)
+    scenario.prepare()
+    recorder = run(scenario, args.users, args.duration, timer,
+                   think_time=args.think_time)
+    recorder.report()
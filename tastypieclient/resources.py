@@ -44,6 +44,11 @@ class ResourceMetaClass(type):
 class Resource(object):
     __metaclass__ = ResourceMetaClass
 
+    # The Resource classes that related fields resolve to, or None to search
+    # every Resource subclass. Set on the classes of a client so that they
+    # only ever resolve to each other.
+    related_resource_classes = None
+
     def __init__(self, base_url, **kwargs):
         """Initialize a Resource.
 
@@ -0,0 +1,164 @@
+"""Build a client at runtime, without a codegen step.
+
+`connect` builds the same Resource subclasses that `ClientBuilder` would
+write out, directly from the service's root listing and schemas:
+
+    client = connect("http://path.com/my/service")
+    client.Post(base_url=client.base_url, **data)
+
+The root listing and schemas are cached on disk, so connecting again does not
+make any requests until `refresh=True` is passed. Synthesized classes are
+cached in memory by the hash of those schemas, so every connection to the
+same API shares one set of classes.
+"""
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+from urlparse import urljoin
+import json
+import os
+import tempfile
+import threading
+
+from .client_builder import Client
+from .client_builder import Resource
+from .client_builder import Schema
+from .fetch import get_json
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".tastypieclient")
+
+# schema hash -> {class name: Resource subclass}
+_class_cache = {}
+_class_cache_lock = threading.Lock()
+
+
+def connect(base_url, cache_dir=CACHE_DIR, refresh=False):
+    """Return a RuntimeClient for the service at `base_url`."""
+    return RuntimeClient(base_url, cache_dir=cache_dir, refresh=refresh)
+
+
+class RuntimeClient(object):
+    def __init__(self, base_url, cache_dir=CACHE_DIR, refresh=False):
+        """Initialize a RuntimeClient.
+
+        Args:
+            base_url: The base URL of the service.
+            cache_dir: Where to cache schemas between runs. Pass None to
+                disable the disk cache.
+            refresh: Fetch the schemas even if they are cached on disk.
+
+        Every Resource subclass is available as an attribute named the same
+        as its generated class, and in the `resources` dict.
+        """
+        self.client = Client(base_url)
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+
+        definitions = None
+        if cache_dir and not refresh:
+            definitions = self._read_cache()
+        if definitions is None:
+            definitions = fetch_definitions(self.client)
+            if cache_dir:
+                self._write_cache(definitions)
+        self.definitions = definitions
+        self.schema_hash = hash_definitions(definitions)
+        self.resources = build_resources(
+            self.client, definitions, self.schema_hash)
+        for class_name, resource_class in self.resources.iteritems():
+            setattr(self, class_name, resource_class)
+
+    @property
+    def cache_path(self):
+        return os.path.join(
+            self.cache_dir, "%s.json" % sha1(self.base_url).hexdigest())
+
+    def _read_cache(self):
+        """Return the cached definitions, or None if there aren't any."""
+        try:
+            with open(self.cache_path) as fp:
+                cached = json.load(fp)
+        except (IOError, ValueError):
+            return None
+        if not isinstance(cached, dict):
+            return None
+        definitions = cached.get('definitions')
+        if (definitions is None or
+                cached.get('schema_hash') != hash_definitions(definitions)):
+            return None
+        return definitions
+
+    def _write_cache(self, definitions):
+        """Atomically write `definitions` to the disk cache.
+
+        The cache is only an optimisation, so if it can't be written (say the
+        directory is read-only or the disk is full) nothing is cached.
+        """
+        tmp_path = None
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({
+                    'base_url': self.base_url,
+                    'schema_hash': hash_definitions(definitions),
+                    'definitions': definitions,
+                }, fp)
+            os.rename(tmp_path, self.cache_path)
+        except (IOError, OSError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def fetch_definitions(client, concurrency=4):
+    """Fetch the root listing and every schema in it.
+
+    Returns a dict of resource name to a dict with the resource's
+    `list_endpoint` and its decoded `schema`.
+    """
+    entry_points = get_json(client.base_url)
+    names = sorted(entry_points)
+    pool = ThreadPool(concurrency)
+    try:
+        schemas = pool.map(
+            get_json,
+            [urljoin(client.base_host, entry_points[name]['schema'])
+             for name in names])
+    finally:
+        pool.close()
+        pool.join()
+    return dict(
+        (name, {'list_endpoint': entry_points[name]['list_endpoint'],
+                'schema': schema})
+        for name, schema in zip(names, schemas))
+
+
+def hash_definitions(definitions):
+    return sha1(json.dumps(definitions, sort_keys=True)).hexdigest()
+
+
+def build_resources(client, definitions, schema_hash=None):
+    """Build a Resource subclass for every definition.
+
+    Classes are cached by `schema_hash`, so building the same definitions
+    again returns the same classes. Related fields only resolve to classes
+    built alongside them, never to classes built from other definitions.
+    """
+    if schema_hash is None:
+        schema_hash = hash_definitions(definitions)
+    with _class_cache_lock:
+        if schema_hash not in _class_cache:
+            resource_classes = {}
+            for name, definition in sorted(definitions.iteritems()):
+                schema = Schema(client, None, data=definition['schema'])
+                resource = Resource(
+                    client, name, definition['list_endpoint'], schema)
+                resource_classes[resource.class_name] = resource.build_class(
+                    module=__name__)
+            related_resource_classes = tuple(resource_classes.values())
+            for resource_class in related_resource_classes:
+                resource_class.related_resource_classes = (
+                    related_resource_classes)
+            _class_cache[schema_hash] = resource_classes
+        return dict(_class_cache[schema_hash])
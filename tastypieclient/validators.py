@@ -0,0 +1,248 @@
+"""Validate batches of outgoing data against a Resource's schema.
+
+Setting fields on a Resource validates one attribute at a time, through the
+descriptor for each field. For bulk uploads, a BatchValidator compiles the
+schema of a Resource class (blank, nullable, readonly, unique, required,
+defaults and field types) once, then checks a whole list of outgoing dicts in
+one pass:
+
+    errors = get_validator(Post).validate(rows)
+    # [FieldError(path='[3].title', message="'title' on 'Post' has no
+    #  data and doesn't allow a default or null value"), ...]
+
+Every error is reported, not just the first, and `unique` fields are checked
+for duplicates within the batch.
+
+As in TastyPie, `blank` means a field may be left out, not that it may be
+empty. Rows without a resource_uri are creates, and on those every field
+that is not blank, nullable, read-only or defaulted must be given. A
+ModelResource may fill such fields from its model instead of failing, so for
+those this check is stricter than the server.
+"""
+from collections import namedtuple
+import datetime
+import uuid
+
+from dateutil import parser as date_parser
+
+from .fields import BooleanField
+from .fields import CharField
+from .fields import DateTimeField
+from .fields import DeferredField
+from .fields import ToManyField
+from .fields import UUIDField
+
+
+FieldError = namedtuple('FieldError', ['path', 'message'])
+
+
+class BatchValidationError(ValueError):
+    def __init__(self, errors):
+        """Raised by `BatchValidator.check` with every error in the batch."""
+        super(BatchValidationError, self).__init__(
+            "%s errors, first: %s: %s" % (
+                len(errors), errors[0].path, errors[0].message))
+        self.errors = errors
+
+
+def _check_string(value):
+    if not isinstance(value, basestring):
+        return "expected a string"
+
+
+def _check_boolean(value):
+    if isinstance(value, bool):
+        return
+    if isinstance(value, basestring) and value.lower() in ('true', 'false'):
+        return
+    return "expected a boolean"
+
+
+def _check_datetime(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return
+    if isinstance(value, basestring):
+        try:
+            date_parser.parse(value)
+            return
+        except (ValueError, OverflowError):
+            pass
+    return "expected an isoformat datetime"
+
+
+def _check_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return
+    if isinstance(value, basestring):
+        try:
+            uuid.UUID(value)
+            return
+        except ValueError:
+            pass
+    return "expected a UUID"
+
+
+def _check_related(value):
+    # TastyPie accepts either a URI or the nested resource's data
+    if not isinstance(value, (basestring, dict)):
+        return "expected a URI"
+
+
+def _check_related_list(value):
+    if not isinstance(value, list):
+        return "expected a list of URIs"
+    for item in value:
+        if not isinstance(item, (basestring, dict)):
+            return "expected a list of URIs"
+
+
+# Field class -> check returning an error message, or None if the value is OK
+TYPE_CHECKS = {
+    CharField: _check_string,
+    BooleanField: _check_boolean,
+    DateTimeField: _check_datetime,
+    UUIDField: _check_uuid,
+    DeferredField: _check_related,
+    ToManyField: _check_related_list,
+}
+
+# TastyPie identifies existing objects in bulk PATCHes by their resource_uri,
+# so it may be sent even though it is read-only.
+READONLY_EXEMPT = frozenset(['resource_uri'])
+
+
+def _unique_key(value):
+    """Return a hashable representation of `value` for unique checks."""
+    if isinstance(value, basestring):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_unique_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (key, _unique_key(item)) for key, item in value.iteritems()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class BatchValidator(object):
+    def __init__(self, resource_class):
+        """Compile a validator for the fields of `resource_class`.
+
+        Args:
+            resource_class: The `Resource` subclass that outgoing data will
+                be validated against.
+        """
+        self.resource_class = resource_class
+        self.fields = {}
+        self.required = []
+        self.required_on_create = []
+        self.unique = []
+        for name, field in sorted(resource_class._fields.iteritems()):
+            type_check = None
+            for cls in type(field).__mro__:
+                if cls in TYPE_CHECKS:
+                    type_check = TYPE_CHECKS[cls]
+                    break
+            readonly = field.readonly and name not in READONLY_EXEMPT
+            self.fields[name] = (field.nullable, readonly, type_check)
+            if field.required:
+                self.required.append(name)
+            elif not (field.blank or field.nullable or field.readonly or
+                      field.has_default):
+                self.required_on_create.append(name)
+            if field.unique:
+                self.unique.append(name)
+
+    def validate(self, rows):
+        """Return a list of FieldErrors for every problem in `rows`.
+
+        Args:
+            rows: A list of dicts, as they will be sent to the server.
+        """
+        errors = []
+        fields = self.fields
+        required = self.required
+        required_on_create = self.required_on_create
+        unique = self.unique
+        seen = dict((name, {}) for name in unique)
+        resource_name = self.resource_class.__name__
+
+        for index, row in enumerate(rows):
+            row_path = "[%s]" % index
+            if not isinstance(row, dict):
+                errors.append(FieldError(row_path, "expected a dict"))
+                continue
+
+            for name in required:
+                if name not in row:
+                    errors.append(FieldError(
+                        "%s.%s" % (row_path, name),
+                        "'%s' is a required field" % name))
+            if 'resource_uri' not in row:
+                for name in required_on_create:
+                    if name not in row:
+                        errors.append(FieldError(
+                            "%s.%s" % (row_path, name),
+                            "'%s' on '%s' has no data and doesn't allow a "
+                            "default or null value" % (name, resource_name)))
+
+            for name, value in row.iteritems():
+                if name not in fields:
+                    errors.append(FieldError(
+                        "%s.%s" % (row_path, name),
+                        "'%s' is not a field on '%s'" %
+                        (name, resource_name)))
+                    continue
+                nullable, readonly, type_check = fields[name]
+                if value is None:
+                    if not nullable:
+                        errors.append(FieldError(
+                            "%s.%s" % (row_path, name),
+                            "'%s' on '%s' is non-nullable" %
+                            (name, resource_name)))
+                    continue
+                if readonly:
+                    errors.append(FieldError(
+                        "%s.%s" % (row_path, name),
+                        "'%s' on '%s' is read-only" % (name, resource_name)))
+                    continue
+                if type_check is not None:
+                    message = type_check(value)
+                    if message:
+                        errors.append(FieldError(
+                            "%s.%s" % (row_path, name), message))
+
+            for name in unique:
+                value = row.get(name)
+                if value is None:
+                    continue
+                key = _unique_key(value)
+                if key in seen[name]:
+                    errors.append(FieldError(
+                        "%s.%s" % (row_path, name),
+                        "'%s' duplicates [%s].%s" %
+                        (name, seen[name][key], name)))
+                else:
+                    seen[name][key] = index
+        return errors
+
+    def check(self, rows):
+        """Raise a BatchValidationError if anything in `rows` is invalid."""
+        errors = self.validate(rows)
+        if errors:
+            raise BatchValidationError(errors)
+
+
+_validators = {}
+
+
+def get_validator(resource_class):
+    """Return the BatchValidator for `resource_class`, compiling it once."""
+    validator = _validators.get(resource_class)
+    if validator is None:
+        validator = _validators[resource_class] = BatchValidator(
+            resource_class)
+    return validator
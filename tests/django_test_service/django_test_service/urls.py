@@ -3,10 +3,20 @@ from django.conf.urls import patterns, include, url
 from django.contrib import admin
 admin.autodiscover()
 
+from tastypie.api import Api
+
+from myservice.api import BlagResource
+from myservice.api import PostResource
+
+v1_api = Api(api_name='v1')
+v1_api.register(BlagResource())
+v1_api.register(PostResource())
+
 urlpatterns = patterns('',
     # Examples:
     # url(r'^$', 'django_test_service.views.home', name='home'),
     # url(r'^blog/', include('blog.urls')),
 
     url(r'^admin/', include(admin.site.urls)),
+    url(r'^api/', include(v1_api.urls)),
 )
@@ -0,0 +1,30 @@
+from tastypie import fields
+from tastypie.authorization import Authorization
+from tastypie.constants import ALL_WITH_RELATIONS
+from tastypie.resources import ModelResource
+
+from myservice.models import Blag
+from myservice.models import Post
+
+
+class BlagResource(ModelResource):
+    posts = fields.ToManyField('myservice.api.PostResource', 'post_set')
+
+    class Meta:
+        queryset = Blag.objects.all()
+        resource_name = 'blag'
+        excludes = ['id']
+        authorization = Authorization()
+
+
+class PostResource(ModelResource):
+    blag = fields.ForeignKey(BlagResource, 'blag')
+
+    class Meta:
+        queryset = Post.objects.all()
+        resource_name = 'post'
+        excludes = ['id']
+        authorization = Authorization()
+        filtering = {
+            'blag': ALL_WITH_RELATIONS,
+        }
@@ -0,0 +1,20 @@
+"""Fakes shared by the tests that stub out HTTP."""
+from tastypieclient import fetch
+
+
+class FakeResponse(object):
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def patch_session_get(test_case, fake_get):
+    """Send every GET through `fake_get` until `test_case` is torn down.
+
+    `fake_get` takes the same arguments as `requests.Session.get` and should
+    return a FakeResponse.
+    """
+    fetch.session.get = fake_get
+    test_case.addCleanup(delattr, fetch.session, 'get')
@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+import traceback
+import unittest
+
+from tastypieclient.fetch import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.results = {}
+
+    def start_leader(self, fn):
+        def leader():
+            try:
+                self.single_flight.do('key', fn)
+            except BaseException as e:
+                self.results['leader'] = e
+        thread = threading.Thread(target=leader)
+        thread.start()
+        return thread
+
+    def start_waiter(self):
+        def waiter():
+            try:
+                self.results['waiter'] = self.single_flight.do(
+                    'key', lambda: 'not shared')
+            except BaseException as e:
+                self.results['waiter'] = e
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        # Give the waiter time to join the leader's call
+        time.sleep(0.1)
+        return thread
+
+    def run_leader_and_waiter(self, fn):
+        leader = self.start_leader(fn)
+        time.sleep(0.1)
+        waiter = self.start_waiter()
+        self.release.set()
+        leader.join()
+        waiter.join()
+
+    def test_waiters_share_the_result(self):
+        def fn():
+            self.release.wait()
+            return 'shared'
+        self.run_leader_and_waiter(fn)
+        self.assertEqual(self.results['waiter'], 'shared')
+
+    def test_waiters_get_the_error(self):
+        def fn():
+            self.release.wait()
+            raise ValueError("boom")
+        self.run_leader_and_waiter(fn)
+        self.assertTrue(isinstance(self.results['leader'], ValueError))
+        self.assertTrue(self.results['waiter'] is self.results['leader'])
+
+    def test_waiters_get_an_error_when_the_leader_is_interrupted(self):
+        def fn():
+            self.release.wait()
+            raise KeyboardInterrupt()
+        self.run_leader_and_waiter(fn)
+        self.assertTrue(isinstance(self.results['leader'], KeyboardInterrupt))
+        self.assertTrue(isinstance(self.results['waiter'], RuntimeError))
+
+    def test_leader_keeps_the_original_traceback(self):
+        def failing_fetch():
+            raise ValueError("boom")
+        try:
+            self.single_flight.do('key', failing_fetch)
+        except ValueError:
+            frames = traceback.extract_tb(sys.exc_info()[2])
+        self.assertEqual(frames[-1][2], 'failing_fetch')
+
+    def test_finished_calls_are_not_shared(self):
+        self.assertEqual(self.single_flight.do('key', lambda: 1), 1)
+        self.assertEqual(self.single_flight.do('key', lambda: 2), 2)
@@ -0,0 +1,222 @@
+from collections import Counter
+from multiprocessing.pool import ThreadPool
+from urlparse import parse_qs
+from urlparse import urlparse
+import json
+import threading
+import time
+import unittest
+
+from tastypieclient.fields import CharField
+from tastypieclient.fields import PagedList
+from tastypieclient.fields import ToManyField
+from tastypieclient.resources import Resource
+from tests.helpers import FakeResponse
+from tests.helpers import patch_session_get
+
+
+BASE_URL = "http://example.com"
+
+
+class StressBlag(Resource):
+    list_endpoint = '/stress/api/v1/blag/'
+    resource_uri = CharField()
+    name = CharField()
+    posts = ToManyField()
+
+
+class StressPost(Resource):
+    list_endpoint = '/stress/api/v1/post/'
+    resource_uri = CharField()
+    title = CharField()
+    blag = CharField()
+
+
+class PagedPost(Resource):
+    list_endpoint = '/paged/api/v1/post/'
+    resource_uri = CharField()
+    title = CharField()
+
+
+class PagedBlag(Resource):
+    list_endpoint = '/paged/api/v1/blag/'
+    resource_uri = CharField()
+    posts = ToManyField(PagedPost, paged=True, filter_field='blag',
+                        page_size=10, order_by='id')
+
+
+class FieldArgumentsTest(unittest.TestCase):
+    def test_positional_arguments(self):
+        field = CharField(True, False, True, False, False, "Help")
+        self.assertTrue(field.blank)
+        self.assertTrue(field.readonly)
+        self.assertEqual(field.help_text, "Help")
+        self.assertFalse(field.has_default)
+
+        field = ToManyField(PagedPost, True, True)
+        self.assertTrue(field.related_resource_class is PagedPost)
+        self.assertTrue(field.blank)
+        self.assertTrue(field.nullable)
+        self.assertFalse(field.paged)
+
+
+class DeferredResolutionStressTest(unittest.TestCase):
+    num_blags = 5
+    posts_per_blag = 4
+    num_threads = 32
+    num_tasks = 2000
+
+    def setUp(self):
+        self.data = {}
+        for blag_id in range(self.num_blags):
+            blag_uri = '/stress/api/v1/blag/%s/' % blag_id
+            post_uris = []
+            for count in range(self.posts_per_blag):
+                post_uri = '/stress/api/v1/post/%s_%s/' % (blag_id, count)
+                post_uris.append(post_uri)
+                self.data[post_uri] = {
+                    'resource_uri': post_uri,
+                    'title': 'Post %s' % count,
+                    'blag': blag_uri,
+                }
+            self.data[blag_uri] = {
+                'resource_uri': blag_uri,
+                'name': 'Blag %s' % blag_id,
+                'posts': post_uris,
+            }
+
+        self.calls = Counter()
+        self.calls_lock = threading.Lock()
+        patch_session_get(self, self.fake_get)
+
+    def fake_get(self, uri, *args, **kwargs):
+        with self.calls_lock:
+            self.calls[uri] += 1
+        # Slow enough that racing threads overlap with the request
+        time.sleep(0.05)
+        return FakeResponse(json.dumps(self.data[urlparse(uri).path]))
+
+    def test_one_request_per_uri(self):
+        blags = [StressBlag(base_url=BASE_URL, **self.data[uri])
+                 for uri in sorted(self.data) if '/blag/' in uri]
+        start = threading.Event()
+
+        def touch(task):
+            start.wait()
+            blag = blags[task % len(blags)]
+            index = (task // len(blags)) % self.posts_per_blag
+            return (blag, index, blag.posts[index])
+
+        pool = ThreadPool(self.num_threads)
+        try:
+            results = pool.map_async(touch, range(self.num_tasks))
+            start.set()
+            results = results.get(timeout=60)
+        finally:
+            pool.close()
+            pool.join()
+
+        expected = set(BASE_URL + uri for uri in self.data if '/post/' in uri)
+        self.assertEqual(set(self.calls), expected)
+        self.assertEqual(set(self.calls.values()), set([1]))
+
+        # Every thread got the same Resource for the same relation
+        for blag, index, post in results:
+            self.assertTrue(blag.posts[index] is post)
+
+
+class PagedListTest(unittest.TestCase):
+    def setUp(self):
+        self.posts = [{'resource_uri': '/paged/api/v1/post/%s/' % count,
+                       'title': 'Post %s' % count} for count in range(25)]
+        self.calls = []
+        patch_session_get(self, self.fake_get)
+        self.blag = PagedBlag(base_url=BASE_URL,
+                              resource_uri='/paged/api/v1/blag/7/',
+                              posts=[post['resource_uri']
+                                     for post in self.posts])
+
+    def fake_get(self, uri, *args, **kwargs):
+        parsed_uri = urlparse(uri)
+        query = parse_qs(parsed_uri.query)
+        self.assertEqual(parsed_uri.path, PagedPost.list_endpoint)
+        self.assertEqual(query['blag'], ['7'])
+        self.assertEqual(query['order_by'], ['id'])
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        self.calls.append(offset)
+        return FakeResponse(json.dumps({
+            'meta': {'total_count': len(self.posts), 'limit': limit,
+                     'offset': offset},
+            'objects': self.posts[offset:offset + limit],
+        }))
+
+    def test_embedded_uris_are_not_hydrated(self):
+        self.assertTrue(isinstance(self.blag.posts, PagedList))
+        self.assertEqual(self.calls, [])
+
+    def test_len_costs_one_request(self):
+        self.assertEqual(len(self.blag.posts), 25)
+        self.assertEqual(len(self.blag.posts), 25)
+        self.assertEqual(self.calls, [0])
+
+    def test_indexing_fetches_only_the_needed_page(self):
+        self.assertEqual(self.blag.posts[12].title, 'Post 12')
+        self.assertEqual(self.blag.posts[19].title, 'Post 19')
+        self.assertEqual(self.calls, [10])
+
+    def test_slicing_across_pages(self):
+        titles = [post.title for post in self.blag.posts[8:22:2]]
+
+        self.assertEqual(titles, ['Post %s' % count
+                                  for count in range(8, 22, 2)])
+        self.assertEqual(self.calls, [0, 10, 20])
+
+    def test_slicing_a_later_page_costs_one_request(self):
+        self.assertEqual([post.title for post in self.blag.posts[20:23]],
+                         ['Post 20', 'Post 21', 'Post 22'])
+        self.assertEqual(self.calls, [20])
+
+    def test_negative_indexes(self):
+        self.assertEqual(self.blag.posts[-1].title, 'Post 24')
+        self.assertEqual(self.blag.posts[-25].title, 'Post 0')
+        self.assertEqual([post.title for post in self.blag.posts[-2:]],
+                         ['Post 23', 'Post 24'])
+        self.assertRaises(IndexError, lambda: self.blag.posts[-26])
+        self.assertRaises(IndexError, lambda: self.blag.posts[25])
+
+    def test_iteration(self):
+        self.assertEqual([post.title for post in self.blag.posts],
+                         ['Post %s' % count for count in range(25)])
+        self.assertEqual(self.calls, [0, 10, 20])
+
+    def test_least_recently_used_pages_are_evicted(self):
+        posts = self.blag.posts
+        posts.max_cached_pages = 2
+        posts[0]
+        posts[10]
+        posts[0]
+        posts[20]  # evicts page 1, the least recently used
+        posts[0]
+        posts[10]
+
+        self.assertEqual(self.calls, [0, 10, 20, 10])
+
+    def test_shrunk_relation_raises_index_error(self):
+        posts = self.blag.posts
+        self.assertEqual(len(posts), 25)
+        del self.posts[15:]
+        try:
+            posts[22]
+        except IndexError as e:
+            self.assertEqual(str(e), "PagedList index out of range")
+        else:
+            self.fail("Expected an IndexError")
+        self.assertEqual(len(posts), 15)
+
+    def test_repr_without_resource_uri(self):
+        blag = PagedBlag(base_url=BASE_URL)
+        self.assertEqual(repr(blag.posts),
+                         "PagedList(/paged/api/v1/post/, blag=None)")
+        self.assertEqual(repr(self.blag.posts),
+                         "PagedList(/paged/api/v1/post/, blag=7)")
@@ -0,0 +1,148 @@
+from urlparse import urlparse
+import json
+import unittest
+
+from tastypieclient.fields import CharField
+from tastypieclient.fields import DeferredField
+from tastypieclient.fields import ToManyField
+from tastypieclient.graph import expand
+from tastypieclient.resources import Resource
+from tests.helpers import FakeResponse
+from tests.helpers import patch_session_get
+
+
+BASE_URL = "http://example.com"
+BLAG_ENDPOINT = '/graph/api/v1/blag/'
+POST_ENDPOINT = '/graph/api/v1/post/'
+
+
+class GraphBlag(Resource):
+    list_endpoint = BLAG_ENDPOINT
+    resource_uri = CharField()
+    name = CharField()
+    posts = ToManyField()
+
+
+class GraphPost(Resource):
+    list_endpoint = POST_ENDPOINT
+    resource_uri = CharField()
+    title = CharField()
+    blag = DeferredField()
+
+
+class ExpandTest(unittest.TestCase):
+    def setUp(self):
+        self.data = {}
+        self.add_blag(1, [10, 11])
+        self.add_blag(2, [20])
+        self.calls = []
+        patch_session_get(self, self.fake_get)
+
+    def add_blag(self, blag_id, post_ids):
+        blag_uri = '%s%s/' % (BLAG_ENDPOINT, blag_id)
+        self.data[blag_uri] = {
+            'resource_uri': blag_uri,
+            'name': 'Blag %s' % blag_id,
+            'posts': ['%s%s/' % (POST_ENDPOINT, post_id)
+                      for post_id in post_ids],
+        }
+        for post_id in post_ids:
+            self.add_post(post_id, blag_uri)
+
+    def add_post(self, post_id, blag_uri):
+        post_uri = '%s%s/' % (POST_ENDPOINT, post_id)
+        self.data[post_uri] = {
+            'resource_uri': post_uri,
+            'title': 'Post %s' % post_id,
+            'blag': blag_uri,
+        }
+        return post_uri
+
+    def fake_get(self, uri, *args, **kwargs):
+        self.calls.append(uri)
+        path = urlparse(uri).path
+        if '/set/' in path:
+            list_endpoint, detail_ids = path.split('set/')
+            objects = [self.data[list_endpoint + detail_id + '/']
+                       for detail_id in detail_ids.strip('/').split(';')
+                       if list_endpoint + detail_id + '/' in self.data]
+            return FakeResponse(json.dumps({'objects': objects}))
+        return FakeResponse(json.dumps(self.data[path]))
+
+    def make_posts(self, *post_ids):
+        return [GraphPost(base_url=BASE_URL,
+                          **self.data['%s%s/' % (POST_ENDPOINT, post_id)])
+                for post_id in post_ids]
+
+    def set_calls(self, list_endpoint):
+        return [uri for uri in self.calls
+                if urlparse(uri).path.startswith(list_endpoint + 'set/')]
+
+    def test_one_set_request_per_resource_per_level(self):
+        posts = self.make_posts(10, 11, 20)
+        expand(posts, depth=2, follow=('blag', 'blag__posts'))
+
+        # The posts were passed in, so only the blags need fetching
+        self.assertEqual(self.calls,
+                         [BASE_URL + BLAG_ENDPOINT + 'set/1;2/'])
+        self.assertEqual(posts[2].blag.name, 'Blag 2')
+        self.assertEqual([post.title for post in posts[0].blag.posts[:]],
+                         ['Post 10', 'Post 11'])
+        self.assertTrue(posts[0].blag.posts[0] is posts[0])
+        # Everything is wired in, so touching it makes no more requests
+        self.assertEqual(len(self.calls), 1)
+
+    def test_already_cached_nodes_are_shared(self):
+        posts = self.make_posts(10, 11)
+        blag = posts[0].blag
+        self.assertEqual(len(self.calls), 1)
+        expand(posts, depth=1)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(posts[1].blag is blag)
+
+    def test_batch_size(self):
+        for blag_id in range(3, 8):
+            self.add_blag(blag_id, [blag_id * 10])
+        posts = self.make_posts(10, 20, 30, 40, 50, 60, 70)
+        expand(posts, depth=1, batch_size=3)
+
+        self.assertEqual(len(self.set_calls(BLAG_ENDPOINT)), 3)
+
+    def test_shared_nodes_are_fetched_once(self):
+        posts = self.make_posts(10, 11)
+        expand(posts, depth=1)
+
+        self.assertEqual(self.calls, [BASE_URL + BLAG_ENDPOINT + 'set/1/'])
+        self.assertTrue(posts[0].blag is posts[1].blag)
+
+    def test_follow_filters_relations(self):
+        posts = self.make_posts(10)
+        expand(posts, depth=3, follow=('blag',))
+
+        self.assertEqual(len(self.calls), 1)
+        blag_posts = posts[0].blag.__dict__['posts'].deferred_fields
+        self.assertTrue(all(deferred.get_cached(posts[0].blag) is None
+                            for deferred in blag_posts))
+
+    def test_non_addressable_uris_are_fetched_alone(self):
+        nested_uri = BLAG_ENDPOINT + '1/nested/'
+        self.data[nested_uri] = dict(self.data[BLAG_ENDPOINT + '1/'],
+                                     name='Nested')
+        post = GraphPost(base_url=BASE_URL, resource_uri=POST_ENDPOINT + '99/',
+                         title='Nested post', blag=nested_uri)
+        expand([post], depth=1)
+
+        self.assertEqual(self.calls, [BASE_URL + nested_uri])
+        self.assertEqual(post.blag.name, 'Nested')
+
+    def test_missing_objects_are_left_unresolved(self):
+        missing_uri = BLAG_ENDPOINT + '404/'
+        post = GraphPost(base_url=BASE_URL, resource_uri=POST_ENDPOINT + '99/',
+                         title='Orphan', blag=missing_uri)
+        found = self.make_posts(10)[0]
+        expand([post, found], depth=1)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(GraphPost._fields['blag'].get_cached(post) is None)
+        self.assertEqual(found.blag.name, 'Blag 1')
@@ -0,0 +1,175 @@
+from StringIO import StringIO
+from urlparse import urlparse
+import json
+import random
+import threading
+import time
+import unittest
+
+from tastypieclient.fields import CharField
+from tastypieclient.fields import DeferredField
+from tastypieclient.fields import ToManyField
+from tastypieclient.loadgen import Action
+from tastypieclient.loadgen import Recorder
+from tastypieclient.loadgen import Scenario
+from tastypieclient.loadgen import ServerTimer
+from tastypieclient.loadgen import TraverseAction
+from tastypieclient.loadgen import percentile
+from tastypieclient.loadgen import run
+from tastypieclient.resources import Resource
+from tests.helpers import FakeResponse
+from tests.helpers import patch_session_get
+
+
+BASE_URL = "http://example.com/"
+
+
+class LoadBlag(Resource):
+    list_endpoint = '/loadgen/api/v1/blag/'
+    resource_uri = CharField()
+    name = CharField()
+    posts = ToManyField()
+
+
+class LoadPost(Resource):
+    list_endpoint = '/loadgen/api/v1/post/'
+    resource_uri = CharField()
+    title = CharField()
+    blag = DeferredField()
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(range(1, 11), 50), 5)
+        self.assertEqual(percentile([1, 2], 50), 1)
+        self.assertEqual(percentile([1, 2], 51), 2)
+        self.assertEqual(percentile(values, 7), 7)
+
+    def test_edges(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([3], 99), 3)
+        self.assertEqual(percentile([1, 2, 3], 0), 1)
+
+
+class FailingAction(Action):
+    name = "fail"
+
+    def run(self, rng):
+        raise KeyError('missing')
+
+
+class RecorderTest(unittest.TestCase):
+    def test_report(self):
+        recorder = Recorder()
+        for count in range(1, 101):
+            recorder.record("detail /post/", count / 1000.0, count / 2000.0)
+        # Failures are counted, but kept out of the latencies
+        recorder.record("detail /post/", 5.0, 0.0, ValueError("boom"))
+        recorder.record("detail /post/", 5.0, 0.0, ValueError("again"))
+        recorder.record("list /post/", 0.010, 0.004)
+        outstream = StringIO()
+        recorder.report(10, outstream=outstream)
+
+        lines = outstream.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0].split()[:2], ["endpoint", "count"])
+        detail = lines[2].split()
+        self.assertEqual(detail[:2], ["detail", "/post/"])
+        self.assertEqual([float(value) for value in detail[2:]],
+                         [102, 10.2, 50.0, 95.0, 99.0, 25.0, 25.0, 2])
+        listing = lines[3].split()
+        self.assertEqual([float(value) for value in listing[2:]],
+                         [1, 0.1, 10.0, 10.0, 10.0, 4.0, 6.0, 0])
+        self.assertEqual(lines[4], "detail /post/: ValueError: boom")
+
+    def test_throughput_uses_measured_time(self):
+        recorder = Recorder()
+        recorder.elapsed = 5.0
+        recorder.record("list /post/", 0.010, 0.004)
+        outstream = StringIO()
+        recorder.report(outstream=outstream)
+
+        listing = outstream.getvalue().splitlines()[2].split()
+        self.assertEqual(float(listing[3]), 0.2)
+
+
+class RunTest(unittest.TestCase):
+    def test_exceptions_are_kept(self):
+        action = FailingAction(LoadPost, BASE_URL)
+        recorder = run(Scenario([action]), 2, 0.05, ServerTimer())
+
+        self.assertTrue(recorder.elapsed >= 0.05)
+        errors = recorder.errors[action.label]
+        self.assertEqual(errors.keys(), [KeyError])
+        self.assertEqual(str(errors[KeyError]), "'missing'")
+
+
+class ScenarioTest(unittest.TestCase):
+    def test_unknown_traverse_field(self):
+        resources = {'LoadPost': LoadPost}
+        scenario = Scenario.from_json(
+            [{'action': 'traverse', 'resource': 'LoadPost', 'field': 'blag'}],
+            resources, BASE_URL)
+        self.assertEqual(scenario.actions[0].label,
+                         "traverse /loadgen/api/v1/post/ blag")
+        self.assertRaises(
+            ValueError, Scenario.from_json,
+            [{'action': 'traverse', 'resource': 'LoadPost', 'field': 'blog'}],
+            resources, BASE_URL)
+
+
+class TraverseActionTest(unittest.TestCase):
+    def setUp(self):
+        self.blag_uri = '/loadgen/api/v1/blag/1/'
+        self.post_uris = ['/loadgen/api/v1/post/%s/' % count
+                          for count in range(3)]
+        self.data = {self.blag_uri: {'resource_uri': self.blag_uri,
+                                     'name': 'Blag',
+                                     'posts': self.post_uris}}
+        for post_uri in self.post_uris:
+            self.data[post_uri] = {'resource_uri': post_uri, 'title': 'Post',
+                                   'blag': self.blag_uri}
+        self.calls = []
+        self.calls_lock = threading.Lock()
+        patch_session_get(self, self.fake_get)
+
+    def fake_get(self, uri, *args, **kwargs):
+        with self.calls_lock:
+            self.calls.append(uri)
+        time.sleep(0.05)
+        return FakeResponse(json.dumps(self.data[urlparse(uri).path]))
+
+    def make_action(self, resource_class, **options):
+        action = TraverseAction(resource_class, BASE_URL, **options)
+        action.prepare({resource_class: [
+            data for data in self.data.values()
+            if data['resource_uri'].startswith(resource_class.list_endpoint)]})
+        return action
+
+    def test_concurrent_traversals_are_not_coalesced(self):
+        action = self.make_action(LoadPost, field='blag')
+        results = []
+
+        def traverse():
+            results.append(action.run(random.Random(0)))
+        threads = [threading.Thread(target=traverse) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls,
+                         [BASE_URL.rstrip('/') + self.blag_uri] * 5)
+        self.assertEqual([blag.name for blag in results], ['Blag'] * 5)
+
+    def test_to_many_traversal_respects_limit(self):
+        action = self.make_action(LoadBlag, field='posts', limit=2)
+        posts = action.run(random.Random(0))
+
+        self.assertEqual(len(posts), 2)
+        self.assertEqual(len(self.calls), 2)
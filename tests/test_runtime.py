@@ -0,0 +1,174 @@
+from urlparse import urlparse
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tastypieclient import runtime
+from tastypieclient.runtime import connect
+from tests.helpers import FakeResponse
+from tests.helpers import patch_session_get
+
+
+BASE_URL = "http://runtime.example.com/api/v1/"
+
+
+def schema(fields):
+    return {
+        'allowed_detail_http_methods': ['get'],
+        'allowed_list_http_methods': ['get'],
+        'default_format': 'application/json',
+        'default_limit': 20,
+        'fields': fields,
+    }
+
+
+def field(type, **kwargs):
+    data = {'type': type, 'blank': False, 'nullable': False,
+            'readonly': False, 'unique': False, 'help_text': '',
+            'default': 'No default provided.'}
+    data.update(kwargs)
+    return data
+
+
+class ConnectTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.calls = []
+        self.data = {
+            '/api/v1/': {
+                'blag': {'list_endpoint': '/api/v1/blag/',
+                         'schema': '/api/v1/blag/schema/'},
+                'post': {'list_endpoint': '/api/v1/post/',
+                         'schema': '/api/v1/post/schema/'},
+            },
+            '/api/v1/blag/schema/': schema({
+                'resource_uri': field('string', readonly=True),
+                'name': field('string'),
+                'posts': field('related', related_type='to_many'),
+            }),
+            '/api/v1/post/schema/': schema({
+                'resource_uri': field('string', readonly=True),
+                'title': field('string'),
+                'blag': field('related', related_type='to_one'),
+            }),
+            '/api/v1/blag/1/': {'resource_uri': '/api/v1/blag/1/',
+                                'name': 'Blag', 'posts': []},
+        }
+        runtime._class_cache.clear()
+        patch_session_get(self, self.fake_get)
+
+    def tearDown(self):
+        runtime._class_cache.clear()
+        shutil.rmtree(self.cache_dir)
+
+    def fake_get(self, uri, *args, **kwargs):
+        self.calls.append(uri)
+        return FakeResponse(json.dumps(self.data[urlparse(uri).path]))
+
+    def connect(self, **kwargs):
+        return connect(BASE_URL, cache_dir=self.cache_dir, **kwargs)
+
+    def change_schema(self):
+        self.data['/api/v1/post/schema/']['fields']['body'] = field('string')
+
+    def test_builds_resource_classes(self):
+        client = self.connect()
+
+        self.assertEqual(sorted(client.resources), ['Blag', 'Post'])
+        self.assertEqual(sorted(client.Post._fields),
+                         ['blag', 'resource_uri', 'title'])
+        self.assertEqual(client.Post.list_endpoint, '/api/v1/post/')
+        self.assertTrue(client.resources['Blag'] is client.Blag)
+
+    def test_cache_miss_fetches_and_writes_the_cache(self):
+        client = self.connect()
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertTrue(os.path.exists(client.cache_path))
+
+    def test_cache_hit_makes_no_requests(self):
+        self.connect()
+        del self.calls[:]
+        runtime._class_cache.clear()
+        client = self.connect()
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(sorted(client.resources), ['Blag', 'Post'])
+
+    def test_hash_mismatch_refetches(self):
+        client = self.connect()
+        with open(client.cache_path) as fp:
+            cached = json.load(fp)
+        cached['definitions']['post']['list_endpoint'] = '/tampered/'
+        with open(client.cache_path, 'w') as fp:
+            json.dump(cached, fp)
+        del self.calls[:]
+        client = self.connect()
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(client.Post.list_endpoint, '/api/v1/post/')
+
+    def test_unreadable_cache_is_a_miss(self):
+        client = self.connect()
+        with open(client.cache_path, 'w') as fp:
+            json.dump(['not', 'a', 'dict'], fp)
+        del self.calls[:]
+        self.connect()
+
+        self.assertEqual(len(self.calls), 3)
+
+    def test_unwritable_cache_is_skipped(self):
+        not_a_dir = os.path.join(self.cache_dir, 'file')
+        open(not_a_dir, 'w').close()
+        client = connect(BASE_URL, cache_dir=not_a_dir)
+        self.assertEqual(sorted(client.resources), ['Blag', 'Post'])
+
+        # Renaming over a directory fails after the temp file is written
+        cache_name = os.path.basename(client.cache_path)
+        os.mkdir(os.path.join(self.cache_dir, cache_name))
+        self.connect(refresh=True)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         sorted(['file', cache_name]))
+
+    def test_refresh_refetches(self):
+        old_client = self.connect()
+        self.change_schema()
+        del self.calls[:]
+        client = self.connect(refresh=True)
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertTrue('body' in client.Post._fields)
+        self.assertFalse(client.Post is old_client.Post)
+
+    def test_without_refresh_the_cached_schema_is_used(self):
+        old_client = self.connect()
+        self.change_schema()
+        client = self.connect()
+
+        self.assertFalse('body' in client.Post._fields)
+        self.assertTrue(client.Post is old_client.Post)
+
+    def test_same_schema_shares_classes(self):
+        first = self.connect()
+        second = connect(BASE_URL, cache_dir=None)
+
+        self.assertEqual(first.schema_hash, second.schema_hash)
+        self.assertTrue(first.Post is second.Post)
+        self.assertTrue(first.Blag is second.Blag)
+
+    def test_related_classes_resolve_within_the_client(self):
+        old_client = self.connect()
+        self.change_schema()
+        client = self.connect(refresh=True)
+
+        post = client.Post(base_url=BASE_URL, resource_uri='/api/v1/post/1/',
+                           title='Post', blag='/api/v1/blag/1/')
+        self.assertTrue(type(post.blag) is client.Blag)
+        self.assertFalse(type(post.blag) is old_client.Blag)
+
+        old_post = old_client.Post(
+            base_url=BASE_URL, resource_uri='/api/v1/post/1/',
+            title='Post', blag='/api/v1/blag/1/')
+        self.assertTrue(type(old_post.blag) is old_client.Blag)
@@ -0,0 +1,125 @@
+import uuid
+import unittest
+
+from tastypieclient.fields import BooleanField
+from tastypieclient.fields import CharField
+from tastypieclient.fields import DateTimeField
+from tastypieclient.fields import DeferredField
+from tastypieclient.fields import ToManyField
+from tastypieclient.fields import UUIDField
+from tastypieclient.resources import Resource
+from tastypieclient.validators import BatchValidationError
+from tastypieclient.validators import BatchValidator
+from tastypieclient.validators import get_validator
+
+
+class ValidatedPost(Resource):
+    list_endpoint = '/validated/api/v1/post/'
+    resource_uri = CharField(readonly=True)
+    uuid = UUIDField(unique=True, blank=True)
+    title = CharField()
+    body = CharField(has_default=True)
+    published = BooleanField(nullable=True)
+    created = DateTimeField(readonly=True)
+    blag = DeferredField()
+    tags = ToManyField(blank=True)
+    slug = CharField(unique=True, blank=True, nullable=True)
+
+
+def valid_row(**kwargs):
+    row = {'title': 'Title', 'blag': '/validated/api/v1/blag/1/'}
+    row.update(kwargs)
+    return row
+
+
+class BatchValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.validator = BatchValidator(ValidatedPost)
+
+    def assertErrors(self, rows, expected):
+        self.assertEqual(
+            sorted((error.path, error.message)
+                   for error in self.validator.validate(rows)),
+            sorted(expected))
+
+    def test_valid_rows(self):
+        self.assertErrors([
+            valid_row(),
+            valid_row(uuid=str(uuid.uuid4()), published='True', body='',
+                      tags=['/validated/api/v1/tag/1/', {'name': 'tag'}]),
+            valid_row(uuid=uuid.uuid4(), published=None, title=''),
+        ], [])
+
+    def test_missing_fields_on_create(self):
+        self.assertErrors([{'body': 'Body'}], [
+            ('[0].title', "'title' on 'ValidatedPost' has no data and "
+                          "doesn't allow a default or null value"),
+            ('[0].blag', "'blag' on 'ValidatedPost' has no data and "
+                         "doesn't allow a default or null value"),
+        ])
+
+    def test_missing_fields_on_update(self):
+        self.assertErrors(
+            [{'resource_uri': '/validated/api/v1/post/1/', 'body': 'Body'}],
+            [])
+
+    def test_resource_uri_is_exempt_from_readonly(self):
+        self.assertErrors(
+            [valid_row(resource_uri='/validated/api/v1/post/1/'),
+             valid_row(created='2014-01-01T00:00:00')],
+            [('[1].created', "'created' on 'ValidatedPost' is read-only")])
+
+    def test_per_field_paths(self):
+        self.assertErrors([
+            valid_row(),
+            valid_row(uuid='not a uuid', published='maybe', blag=None),
+            valid_row(title=3, tags='/validated/api/v1/tag/1/', bogus=1),
+            'not a dict',
+        ], [
+            ('[1].uuid', "expected a UUID"),
+            ('[1].published', "expected a boolean"),
+            ('[1].blag', "'blag' on 'ValidatedPost' is non-nullable"),
+            ('[2].title', "expected a string"),
+            ('[2].tags', "expected a list of URIs"),
+            ('[2].bogus', "'bogus' is not a field on 'ValidatedPost'"),
+            ('[3]', "expected a dict"),
+        ])
+
+    def test_unique_within_batch(self):
+        shared = str(uuid.uuid4())
+        self.assertErrors([
+            valid_row(uuid=shared, slug='a'),
+            valid_row(uuid=shared, slug='b'),
+            valid_row(slug='a'),
+            valid_row(slug=None),
+            valid_row(slug=None),
+        ], [
+            ('[1].uuid', "'uuid' duplicates [0].uuid"),
+            ('[2].slug', "'slug' duplicates [0].slug"),
+        ])
+
+    def test_unique_with_nested_values(self):
+        self.assertErrors([
+            valid_row(slug={'x': [1, {'y': [2]}]}),
+            valid_row(slug={'x': [1, {'y': [2]}]}),
+            valid_row(slug=set([1])),
+        ], [
+            ('[0].slug', "expected a string"),
+            ('[1].slug', "expected a string"),
+            ('[1].slug', "'slug' duplicates [0].slug"),
+            ('[2].slug', "expected a string"),
+        ])
+
+    def test_check_raises_every_error(self):
+        self.validator.check([valid_row()])
+        try:
+            self.validator.check([{}, valid_row(title=None)])
+        except BatchValidationError as e:
+            self.assertEqual(len(e.errors), 3)
+            self.assertTrue(isinstance(e, ValueError))
+        else:
+            self.fail("Expected a BatchValidationError")
+
+    def test_get_validator_is_cached(self):
+        self.assertTrue(
+            get_validator(ValidatedPost) is get_validator(ValidatedPost))